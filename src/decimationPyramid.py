@@ -0,0 +1,275 @@
+"""
+Multi-resolution min/max/mean pyramid for browsing long fluxgate captures
+Rylan Stutters
+Oct 2026
+
+Each level k summarizes blocks of 2^k samples with the min, max and mean of
+every column, so a plot of any window only has to touch about as many points
+as it has pixels. Raw samples are not kept: levels start at a base block size,
+and windows that need full resolution are read from the csv or binary archive.
+"""
+
+import numpy as np
+import pandas as pd
+import os
+
+
+class fieldPyramid:
+    """Power-of-two decimation pyramid built incrementally as samples arrive
+
+    Attributes:
+        columns (list): names of the logged columns, first is the x axis (position or time)
+        base (int): finest level kept, blocks of 2^base samples
+        levels (list): per level from base up, dict of 'min', 'max', 'sum', 'count' buffers and 'size'
+        tail (np.ndarray): samples not yet filling a base block
+        n (int): number of samples appended
+    """
+
+    def __init__(self, columns, base=4, capacity=256):
+        """Initialize empty pyramid
+
+        Args:
+            columns (list): column names, first column is used as the x axis for queries
+            base (int): finest level kept; finer windows are read from the raw data
+            capacity (int): initial number of base blocks to allocate for
+        """
+        self.columns = list(columns)
+        self.base = base
+        self.levels = []
+        self.tail = np.empty((0, len(self.columns)))
+        self.n = 0
+        self._capacity = capacity
+
+    def _new_level(self, cap):
+        ncol = len(self.columns)
+        self.levels.append({"min": np.empty((cap, ncol)),
+                            "max": np.empty((cap, ncol)),
+                            "sum": np.empty((cap, ncol)),
+                            "count": np.empty(cap, dtype=int),
+                            "size": 0})
+
+    def _push(self, i, mn, mx, sm, cnt):
+        # append a batch of blocks to level base + i, doubling its buffers when full
+        if i == len(self.levels):
+            self._new_level(max(len(cnt), self._capacity >> i, 1))
+        lvl = self.levels[i]
+        size = lvl["size"]
+        need = size + len(cnt)
+        if need > len(lvl["count"]):
+            cap = max(need, 2 * len(lvl["count"]))
+            for key in ("min", "max", "sum", "count"):
+                new = np.empty((cap,) + lvl[key].shape[1:], dtype=lvl[key].dtype)
+                new[:size] = lvl[key][:size]
+                lvl[key] = new
+        lvl["min"][size:need] = mn
+        lvl["max"][size:need] = mx
+        lvl["sum"][size:need] = sm
+        lvl["count"][size:need] = cnt
+        lvl["size"] = need
+
+    def _stats(self, i):
+        # min, max, sum and count views of the filled part of level base + i
+        lvl = self.levels[i]
+        size = lvl["size"]
+        return lvl["min"][:size], lvl["max"][:size], lvl["sum"][:size], lvl["count"][:size]
+
+    def extend(self, rows):
+        """Add a block of samples, merging completed blocks upward level by level
+
+        Args:
+            rows (2D array-like): samples, one row each
+        """
+        rows = np.atleast_2d(np.asarray(rows, dtype=float))
+        if rows.shape[1] != len(self.columns):
+            raise RuntimeError(f'Expected {len(self.columns)} values, got {rows.shape[1]}')
+
+        data = np.concatenate([self.tail, rows]) if len(self.tail) else rows
+        self.n += len(rows)
+
+        # whole base blocks at once, the remainder waits for the next call
+        B = 2**self.base
+        m = len(data) // B * B
+        self.tail = data[m:].copy()
+        if m == 0:
+            return
+        blocks = data[:m].reshape(-1, B, data.shape[1])
+        self._push(0, blocks.min(axis=1), blocks.max(axis=1), blocks.sum(axis=1),
+                   np.full(len(blocks), B))
+
+        # pair up blocks on each level that have not been merged into the next one yet
+        i = 0
+        while True:
+            mn, mx, sm, cnt = self._stats(i)
+            done = 2 * self.levels[i + 1]["size"] if i + 1 < len(self.levels) else 0
+            stop = len(cnt) // 2 * 2
+            if stop <= done:
+                break
+            shape = (-1, 2, len(self.columns))
+            self._push(i + 1,
+                       mn[done:stop].reshape(shape).min(axis=1),
+                       mx[done:stop].reshape(shape).max(axis=1),
+                       sm[done:stop].reshape(shape).sum(axis=1),
+                       cnt[done:stop].reshape(-1, 2).sum(axis=1))
+            i += 1
+
+    def append(self, row):
+        """Add one sample
+
+        Args:
+            row (array-like): one value per column
+        """
+        self.extend(np.asarray(row, dtype=float)[None, :])
+
+    def level_arrays(self, k):
+        """Get the summaries of a single level as arrays
+
+        Args:
+            k (int): level, block size is 2^k samples, at least base
+
+        Returns:
+            dict: 'min', 'max', 'mean' arrays of shape (blocks, columns)
+        """
+        mn, mx, sm, cnt = self._stats(k - self.base)
+        return {"min": mn, "max": mx, "mean": sm / cnt[:, None]}
+
+    def query(self, xmin=None, xmax=None, max_points=2000, raw=None):
+        """Fetch the coarsest level that still resolves a window with max_points blocks
+
+        Assumes the x axis (first column) increases monotonically, as it does
+        for both position scans and timed captures.
+
+        Args:
+            xmin (float): start of the visible window; None for start of data
+            xmax (float): end of the visible window; None for end of data
+            max_points (int): maximum number of blocks to return
+            raw (callable): raw(start, stop) returning samples start:stop as an array with
+                the pyramid columns; used when the window needs finer than the base level
+
+        Returns:
+            dict: 'level', 'x' (block mean of x axis), and 'min', 'max', 'mean' DataFrames
+        """
+        if not self.levels:
+            if raw is None or self.n == 0:
+                raise RuntimeError('Pyramid has no complete blocks yet')
+
+        # sample range of the window, to base block resolution from the first x of each block
+        B = 2**self.base
+        if self.levels:
+            first_x = self._stats(0)[0][:, 0]
+            b0 = 0 if xmin is None else max(int(np.searchsorted(first_x, xmin, side='right')) - 1, 0)
+            b1 = len(first_x) if xmax is None else int(np.searchsorted(first_x, xmax, side='right'))
+            i0 = b0 * B
+            i1 = self.n if b1 == len(first_x) else b1 * B
+        else:
+            i0, i1 = 0, self.n
+        span = max(i1 - i0, 1)
+
+        # smallest level whose block count fits
+        k = int(np.ceil(np.log2(span / max_points))) if span > max_points else 0
+
+        if k < self.base and raw is not None:
+            data = np.asarray(raw(i0, i1), dtype=float)
+            if xmin is not None or xmax is not None:
+                x = data[:, 0]
+                keep = np.ones(len(x), dtype=bool) if xmin is None else x >= xmin
+                if xmax is not None:
+                    keep &= x <= xmax
+                data = data[keep]
+            df = pd.DataFrame(data, columns=self.columns)
+            return {"level": 0, "x": data[:, 0], "min": df, "max": df, "mean": df}
+
+        # coarsest level available caps k; the tail is left out of the summaries
+        k = min(max(k, self.base), self.base + len(self.levels) - 1)
+        mn, mx, sm, cnt = self._stats(k - self.base)
+        b0 = i0 >> k
+        b1 = min(-(-i1 >> k), len(cnt))
+        mean = sm[b0:b1] / cnt[b0:b1, None]
+
+        return {"level": k,
+                "x": mean[:, 0],
+                "min": pd.DataFrame(mn[b0:b1], columns=self.columns),
+                "max": pd.DataFrame(mx[b0:b1], columns=self.columns),
+                "mean": pd.DataFrame(mean, columns=self.columns)}
+
+    def save(self, path):
+        """Write pyramid to a .npz file, summaries only
+
+        Args:
+            path (str): output file
+        """
+        arrays = {"columns": np.array(self.columns), "base": self.base,
+                  "n": self.n, "tail": self.tail}
+        for i in range(len(self.levels)):
+            mn, mx, sm, cnt = self._stats(i)
+            arrays[f"min_{i}"] = mn
+            arrays[f"max_{i}"] = mx
+            arrays[f"sum_{i}"] = sm
+            arrays[f"count_{i}"] = cnt
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """Read pyramid back from a .npz file written by save
+
+        Args:
+            path (str): input file
+
+        Returns:
+            fieldPyramid: loaded pyramid, ready for further appends
+        """
+        with np.load(path) as f:
+            pyr = cls(f["columns"].tolist(), base=int(f["base"]))
+            pyr.n = int(f["n"])
+            pyr.tail = f["tail"].reshape(-1, len(pyr.columns))
+            i = 0
+            while f"count_{i}" in f:
+                pyr._push(i, f[f"min_{i}"], f[f"max_{i}"], f[f"sum_{i}"], f[f"count_{i}"])
+                i += 1
+        return pyr
+
+    @classmethod
+    def from_csv(cls, file, base=4, chunksize=65536):
+        """Build a pyramid for an existing capture in data/, reading it in chunks
+        The first csv column is the x axis, so it must be position or time
+
+        Args:
+            file (str): name of csv file in data/
+            base (int): finest level kept
+            chunksize (int): rows read at once
+
+        Returns:
+            fieldPyramid: pyramid over every row of the file
+        """
+        path = os.path.join("data", file)
+        columns = pd.read_csv(path, header=1, nrows=0).columns
+        if columns[0] not in ("Position (cm)", "Time (s)"):
+            raise RuntimeError(f'{file} has no position or time column to use as the x axis')
+
+        pyr = cls(columns, base=base)
+        for chunk in pd.read_csv(path, header=1, chunksize=chunksize):
+            pyr.extend(chunk.to_numpy(dtype=float))
+        return pyr
+
+
+def plot_pyramid(ax, pyr, field_comp="B_y (uT)", xmin=None, xmax=None, max_points=2000, raw=None, **kwargs):
+    """Plot the min/max envelope and mean of one column over a window
+
+    Args:
+        ax (matplotlib axis): axis to draw on
+        pyr (fieldPyramid): pyramid to query
+        field_comp (str): column to plot
+        xmin (float): start of window
+        xmax (float): end of window
+        max_points (int): resolution to fetch, about the pixel width of the axis
+        raw (callable): raw sample reader passed to fieldPyramid.query
+
+    Returns:
+        int: pyramid level that was drawn
+    """
+    q = pyr.query(xmin, xmax, max_points, raw)
+
+    line, = ax.plot(q["x"], q["mean"][field_comp], **kwargs)
+    if q["level"] > 0:
+        ax.fill_between(q["x"], q["min"][field_comp], q["max"][field_comp],
+                        color=line.get_color(), alpha=0.3, linewidth=0)
+    return q["level"]
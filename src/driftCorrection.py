@@ -0,0 +1,128 @@
+"""
+Incremental drift model fit to reference readings taken during a scan
+Rylan Stutters
+Oct 2026
+
+Reference readings are either taken with the probe returned to a fixed reference
+point, or with the coil switched off. A low order polynomial in time is fit to
+them per axis and updated as each reference arrives, so every scan point can be
+corrected with the drift known at the time it was measured.
+"""
+
+import numpy as np
+import pandas as pd
+import os
+
+
+class driftModel:
+    """Per axis polynomial fit of reference readings against time
+
+    Attributes:
+        order (int): polynomial order in time
+        forget (float): weight kept by previous references at each update, 1 keeps all
+        mode (str): 'reference' removes drift relative to the first reference,
+            'background' removes the full reference reading (coil off references)
+        t_first (float): time of the first reference
+        n (int): number of references added
+    """
+
+    def __init__(self, order=1, forget=1, mode='reference', time_scale=60):
+        """Initialize empty model
+
+        Args:
+            order (int): polynomial order in time, 0 for a constant offset
+            forget (float): weight kept by previous references at each update
+            mode (str): 'reference' or 'background'
+            time_scale (float): seconds per fit time unit, keeps the normal equations well scaled
+        """
+        if mode not in ('reference', 'background'):
+            raise RuntimeError(f"mode must be 'reference' or 'background', not {mode}")
+
+        self.order = order
+        self.forget = forget
+        self.mode = mode
+        self.time_scale = time_scale
+        self.t_first = None
+        self.n = 0
+
+        # accumulated normal equations of the least squares fit
+        self._ata = np.zeros((order + 1, order + 1))
+        self._atb = np.zeros((order + 1, 3))
+        self._coef = np.zeros((order + 1, 3))
+
+    def _powers(self, t):
+        return np.power.outer(np.asarray(t, dtype=float) / self.time_scale, np.arange(self.order + 1))
+
+    def add(self, t, B):
+        """Add a reference reading and refit
+
+        Args:
+            t (float): seconds since the start of the scan
+            B (np.ndarray): reference fields in uT
+        """
+        B = np.asarray(B, dtype=float)
+        if self.t_first is None:
+            self.t_first = t
+
+        a = self._powers(t)
+        self._ata = self.forget * self._ata + np.outer(a, a)
+        self._atb = self.forget * self._atb + np.outer(a, B)
+        self.n += 1
+
+        # fit only as many terms as there are references, higher ones stay zero
+        k = min(self.n, self.order + 1)
+        self._coef[:] = 0
+        self._coef[:k] = np.linalg.lstsq(self._ata[:k, :k], self._atb[:k], rcond=None)[0]
+
+    def drift(self, t):
+        """Fitted reference reading at time t
+
+        Args:
+            t (float or np.ndarray): seconds since the start of the scan
+
+        Returns:
+            np.ndarray: fields in uT, shape (3,) or (len(t), 3)
+        """
+        return self._powers(t) @ self._coef
+
+    def correction(self, t):
+        """Amount to subtract from a reading taken at time t
+
+        Args:
+            t (float or np.ndarray): seconds since the start of the scan
+
+        Returns:
+            np.ndarray: fields in uT, zero until the first reference
+        """
+        if self.n == 0:
+            return np.zeros(np.shape(t) + (3,))
+        # relative to the fit rather than the first raw reading, so its noise is not carried along
+        if self.mode == 'reference':
+            return self.drift(t) - self.drift(self.t_first)
+        return self.drift(t)
+
+
+def correct_csv(file, order=1, mode='reference'):
+    """Re-correct a logged scan with a fit over all of its references
+
+    Unlike the live correction, points before a reference also benefit from it.
+
+    Args:
+        file (str): scan csv in data/, logged with time and its <name>_ref.csv alongside
+        order (int): polynomial order in time
+        mode (str): 'reference' or 'background'
+
+    Returns:
+        pd.DataFrame: scan with the corrected columns replaced
+    """
+    df = pd.read_csv(os.path.join("data", file), header=1)
+    ref = pd.read_csv(os.path.join("data", file[:-4] + "_ref.csv"), header=1)
+
+    model = driftModel(order=order, mode=mode)
+    for row in ref.to_numpy(dtype=float):
+        model.add(row[0], row[1:4])
+
+    raw = df[["B_x (uT)", "B_y (uT)", "B_z (uT)"]].to_numpy(dtype=float)
+    corr = raw - model.correction(df["Time (s)"].to_numpy(dtype=float))
+    df[["B_x corr (uT)", "B_y corr (uT)", "B_z corr (uT)"]] = corr
+    return df
@@ -0,0 +1,138 @@
+"""
+asyncio interface to the fluxgateLJ class
+Rylan Stutters
+Oct 2026
+
+All blocking LJM calls run on one worker thread owned by each asyncFluxgateLJ,
+so the event loop stays free to drive stages, power supplies or other fluxgates.
+
+Example:
+    async with asyncFluxgateLJ(csv_log=True) as fg:
+        await fg.connect(x=0, y=1, z=2)
+        print(await fg.read_single())
+        async with contextlib.aclosing(fg.stream(scan_rate=200)) as blocks:
+            async for block in blocks:
+                ...
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from fluxgateDAQ import fluxgateLJ
+
+
+class asyncFluxgateLJ:
+    """Awaitable counterpart of fluxgateLJ
+
+    Attributes:
+        fg (fluxgateLJ): wrapped device, None until connect
+        streaming (bool): True while a stream is running
+    """
+
+    def __init__(self, **kwargs):
+        """Initialize object, connection is made by connect
+
+        Args:
+            kwargs: passed to fluxgateLJ
+        """
+        self.kwargs = kwargs
+        self.fg = None
+        self.streaming = False
+        self._stream = None
+        self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fluxgateLJ")
+
+    async def _call(self, fn, *args, **kwargs):
+        # run a blocking call on the worker thread, calls are executed in submission order
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._worker, functools.partial(fn, *args, **kwargs))
+
+    def _check_connected(self):
+        if self.fg is None:
+            raise RuntimeError('Not connected, await connect first')
+
+    def _stop_stream(self, start):
+        # queue stop_stream behind the start of the live stream, once per stream
+        if self._stream is not start:
+            return None
+        self._stream = None
+        self.streaming = False
+
+        fg = self.fg
+        def stop():
+            # the single worker has run start by now, only stop what actually started
+            if start.exception() is None:
+                fg.stop_stream()
+        return asyncio.wrap_future(self._worker.submit(stop))
+
+    async def connect(self, x=0, y=1, z=2):
+        """Open the Labjack and setup input channels
+
+        Args:
+            x (int): AI# channel to read in Bx
+            y (int): AI# channel to read in By
+            z (int): AI# channel to read in Bz
+        """
+        self.fg = await self._call(fluxgateLJ, **self.kwargs)
+        await self._call(self.fg.setup, x=x, y=y, z=z)
+
+    async def read_single(self):
+        """Read single set of values from device
+
+        Returns:
+            np.ndarray: fields in uT
+        """
+        self._check_connected()
+        if self.streaming:
+            raise RuntimeError('Cannot read_single while streaming')
+        return await self._call(self.fg.read_single)
+
+    async def stream(self, scan_rate=100, scans_per_read=50):
+        """Asynchronously iterate over blocks of streamed scans
+
+        The stream is stopped when the iteration ends, breaks or is cancelled,
+        including while it is still starting. Wrap in contextlib.aclosing when
+        breaking out early so the stop is not left to garbage collection; close
+        also stops a stream that is still running.
+
+        Args:
+            scan_rate (float): scans per second requested
+            scans_per_read (int): scans in each block
+
+        Yields:
+            np.ndarray: fields in uT, shape (scans_per_read, 3)
+        """
+        self._check_connected()
+        if self.streaming:
+            raise RuntimeError('Stream already running')
+
+        # claim the device before the first await so read_single is refused meanwhile
+        self.streaming = True
+        fg = self.fg
+        start = self._worker.submit(fg.start_stream, scan_rate, scans_per_read)
+        self._stream = start
+        try:
+            # shielded so cancelling the consumer never cancels the submitted start
+            await asyncio.shield(asyncio.wrap_future(start))
+            while True:
+                yield await self._call(fg.read_stream)
+        finally:
+            stop = self._stop_stream(start)
+            if stop is not None:
+                await asyncio.shield(stop)
+
+    async def close(self):
+        """Stop any running stream, save logged data, release the Labjack and stop the worker thread
+
+        """
+        if self._stream is not None:
+            await asyncio.shield(self._stop_stream(self._stream))
+        if self.fg is not None:
+            await self._call(self.fg.close)
+            self.fg = None
+        self._worker.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
@@ -16,6 +16,10 @@ import numpy as np
 import pandas as pd
 from datetime import datetime
 import csv
+import time
+from decimationPyramid import fieldPyramid
+from driftCorrection import driftModel
+from sampleArchive import archiveWriter
 
 # import labjack-ljm
 try:
@@ -33,10 +37,15 @@ class fluxgateLJ:
         filename (str): name of csv file to log to
         increment (float): number of centimeters each measurement is seperated by; set to 0 if not used
         position (float): current position of the measurement
+        pyramid (fieldPyramid): min/max/mean decimation pyramid of the logged data; None if disabled
+        drift (driftModel): drift fit to reference readings; None if drift correction is off
+        reference_due (bool): set once reference_every readings were taken since the last reference
+        archive (archiveWriter): binary sample archive written alongside the csv; None if disabled
     """
 
     def __init__(self, LJ_type='T7', LJ_connection='USB', LJ_id='ANY',
-                 conversion_factor=100, csv_log=False, increment=0, ):
+                 conversion_factor=100, csv_log=False, increment=0, pyramid=True,
+                 drift=None, drift_order=1, reference_every=0, bin_log=False, ):
         """Initialize object: connect
 
         Args:
@@ -46,6 +55,13 @@ class fluxgateLJ:
             conversion_factor (int): conversion factor for fluxgate model in uT/V
             csv_log (bool): controls whether measurements are logged to csv
             increment (float): number of centimeters each measurement is seperated by; set to 0 if not used
+            pyramid (bool): build a decimation pyramid alongside the csv log for fast browsing
+            drift (str): drift correction from read_reference readings. None|reference|background
+                reference: probe returned to a fixed point, drift since the first reference is removed
+                background: coil off readings, the whole fitted reading is removed
+            drift_order (int): polynomial order in time of the drift fit
+            reference_every (int): readings between requested references; set to 0 if not used
+            bin_log (bool): also log to a memory mappable binary archive, data/<filename>.fgb; requires csv_log
         """
 
         # get LJ handle
@@ -55,6 +71,18 @@ class fluxgateLJ:
         
         self.increment = increment
         self.conversion_factor = conversion_factor
+        self.use_pyramid = pyramid
+        self.pyramid = None
+        self.start_time = time.monotonic()
+
+        # drift correction from interleaved reference readings
+        self.drift = driftModel(order=drift_order, mode=drift) if drift is not None else None
+        self.reference_every = reference_every
+        self.reference_due = False
+        self.readings = 0
+
+        self.use_archive = bin_log
+        self.archive = None
         
         # start logging csv
         if csv_log == True:
@@ -83,27 +111,116 @@ class fluxgateLJ:
         # get channel addresses
         self.ch = ljm.namesToAddresses(3, (f'AIN{x}', f'AIN{y}', f'AIN{z}'))[0]
 
+    def _read(self):
+        # one raw reading of the x, y, z channels in uT
+        dataTypes = [ljm.constants.FLOAT32, ljm.constants.FLOAT32,
+              ljm.constants.FLOAT32]
+        nchannels = len(self.ch)
+
+        dat = np.array(ljm.eReadAddresses(self.handle, nchannels, self.ch, dataTypes))
+        return dat * self.conversion_factor
+
+    def _correct(self, dat, times):
+        # subtract the current drift fit, returns corrected values and the row(s) to log
+        self.readings += len(np.atleast_2d(dat))
+        if self.reference_every != 0 and self.readings >= self.reference_every:
+            self.reference_due = True
+
+        corr = dat - self.drift.correction(times)
+        return corr, np.column_stack([np.atleast_2d(dat), np.atleast_2d(corr)])
+
     def read_single(self):
-        """Read single set of values from device. Use read_data get a longer sequence
+        """Read single set of values from device. Use read_stream get a longer sequence
         Logs to csv file as well if csv_log was set true upon init
+        With drift correction on, raw and corrected values are both logged
 
         Returns:
-            np.ndarray: fields in uT
+            np.ndarray: fields in uT, drift corrected if enabled
         """
-        dataTypes = [ljm.constants.FLOAT32, ljm.constants.FLOAT32,
-              ljm.constants.FLOAT32]
-        nchannels = len(self.ch)
+        dat = self._read()
+        t = time.monotonic() - self.start_time
+        row = dat
 
-        # read data
-        dat = np.array(ljm.eReadAddresses(self.handle, nchannels, self.ch, dataTypes))
-        dat = dat * self.conversion_factor
+        if self.drift is not None:
+            dat, row = self._correct(dat, t)
         
         # write a line to csv file if csv_log enabled
         if self.csv_log == True:
-            self.log_csv(dat)
+            self.log_csv(row, t)
+
+        return dat
+
+    def read_reference(self):
+        """Read a reference: probe at the reference point or coil switched off
+        Updates the drift fit and logs to data/<filename>_ref.csv if csv_log was set true upon init
+
+        Returns:
+            np.ndarray: reference fields in uT
+        """
+        if self.drift is None:
+            raise RuntimeError('Drift correction is off, set drift upon init')
+
+        dat = self._read()
+        t = time.monotonic() - self.start_time
+        self.drift.add(t, dat)
+        self.readings = 0
+        self.reference_due = False
+
+        if self.csv_log == True:
+            try:
+                with open(f"data/{self.filename[:-4]}_ref.csv", 'a', newline='') as csvfile:
+                    writer = csv.writer(csvfile)
+                    writer.writerow([t] + dat.tolist())
+            except Exception as e:
+                print(f"An error occurred: {e}")
+
+        return dat
+
+    def start_stream(self, scan_rate=100, scans_per_read=50):
+        """Start hardware timed streaming of the x, y, z channels
+
+        Args:
+            scan_rate (float): scans per second requested
+            scans_per_read (int): scans returned by each read_stream call
+
+        Returns:
+            float: scan rate set by the device
+        """
+        self.scan_rate = ljm.eStreamStart(self.handle, scans_per_read, len(self.ch),
+                                          list(self.ch), scan_rate)
+        self.stream_start = time.monotonic()
+        self.scans_read = 0
+        return self.scan_rate
+
+    def read_stream(self):
+        """Read the next block of streamed scans, blocking until it is available
+        Logs to csv file as well if csv_log was set true upon init
+
+        Returns:
+            np.ndarray: fields in uT, shape (scans_per_read, 3)
+        """
+        aData, deviceBacklog, ljmBacklog = ljm.eStreamRead(self.handle)
+        dat = np.array(aData).reshape(-1, len(self.ch)) * self.conversion_factor
+
+        # sample times from the scan rate rather than when the block arrived
+        times = self.stream_start - self.start_time + (self.scans_read + np.arange(len(dat))) / self.scan_rate
+        self.scans_read += len(dat)
+        rows = dat
+
+        if self.drift is not None:
+            dat, rows = self._correct(dat, times)
+
+        if self.csv_log == True:
+            self.log_csv(rows, times)
 
         return dat
 
+    def stop_stream(self):
+        """Stop streaming
+
+        """
+        ljm.eStreamStop(self.handle)
+
     def init_csv(self):
         """Initialize csv file
 
@@ -111,38 +228,92 @@ class fluxgateLJ:
 
         self.filename = f'fluxgate_{datetime.now().strftime("20%y-%m-%d_%H.%M.%S")}.csv'
 
-        # write header of csv file
+        # raw fields, then corrected fields and reading time with drift correction
+        columns = ["B_x (uT)", "B_y (uT)", "B_z (uT)"]
+        if self.drift is not None:
+            columns += ["B_x corr (uT)", "B_y corr (uT)", "B_z corr (uT)", "Time (s)"]
         if self.increment != 0:
-            with open(f"data/{self.filename}", 'w', newline='') as csvfile:
-                csvfile.write(datetime.now().strftime("20%y-%m-%d, %H:%M:%S\n\n"))
-                csvfile.write("Position (cm),B_x (uT),B_y (uT),B_z (uT)\n")
+            columns = ["Position (cm)"] + columns
 
-        else:
-            with open("data/{self.filename}", 'w', newline='') as csvfile:
+        # write header of csv file
+        with open(f"data/{self.filename}", 'w', newline='') as csvfile:
+            csvfile.write(datetime.now().strftime("20%y-%m-%d, %H:%M:%S\n\n"))
+            csvfile.write(",".join(columns) + "\n")
+
+        if self.drift is not None:
+            with open(f"data/{self.filename[:-4]}_ref.csv", 'w', newline='') as csvfile:
                 csvfile.write(datetime.now().strftime("20%y-%m-%d, %H:%M:%S\n\n"))
-                csvfile.write("B_x (uT),B_y (uT),B_z (uT)\n")
-                
+                csvfile.write("Time (s),B_x (uT),B_y (uT),B_z (uT)\n")
         
         self.position = 0
 
+        # binary archive always carries the reading time
+        if self.use_archive:
+            self.archive = archiveWriter(f"data/{self.filename[:-4]}.fgb",
+                                         columns if self.drift is not None else columns + ["Time (s)"])
+
+        # x axis of the pyramid is position for scans, elapsed time otherwise
+        if self.use_pyramid:
+            if self.increment != 0:
+                self.pyramid = fieldPyramid(columns)
+            else:
+                self.pyramid = fieldPyramid(["Time (s)"] + [c for c in columns if c != "Time (s)"])
+
     
 
-    def log_csv(self, data):
-        """Write np array to newline in the csv file
+    def log_csv(self, data, times=None):
+        """Write np array to newline(s) in the csv file
 
         Args:
-            data (np array): data to be written to the csv file
+            data (np array): data to be written to the csv file, a single row or a block of rows
+            times (np array): seconds since init of each row; defaults to now
         """
+        rows = np.atleast_2d(data)
+        if times is None:
+            times = np.full(len(rows), time.monotonic() - self.start_time)
+        times = np.broadcast_to(times, (len(rows),))
+
+        # reading time is logged last with drift correction
+        if self.drift is not None:
+            rows = np.column_stack([rows, times])
 
         # add position to data line if increment enabled
         if self.increment != 0:
-            data = np.insert(data, 0, self.position)
-            self.position += self.increment
+            rows = np.column_stack([self.position + self.increment * np.arange(len(rows)), rows])
+            self.position += self.increment * len(rows)
+
+        # keep the decimation pyramid in step with the csv, timestamped if no position
+        if self.pyramid is not None:
+            if self.increment != 0:
+                self.pyramid.extend(rows)
+            else:
+                # time is already the x axis, drop the logged time column
+                self.pyramid.extend(np.column_stack([times, rows[:, :len(self.pyramid.columns) - 1]]))
 
         # write newline into csv file
         try:
             with open(f"data/{self.filename}", 'a', newline='') as csvfile:
                 writer = csv.writer(csvfile)
-                writer.writerow(data.tolist())
+                writer.writerows(rows.tolist())
         except Exception as e:
             print(f"An error occurred: {e}")
+
+        if self.archive is not None:
+            self.archive.append(rows if self.drift is not None else np.column_stack([rows, times]))
+
+    def save_pyramid(self):
+        """Write the decimation pyramid next to the csv file as data/<filename>.pyr.npz
+
+        """
+        if self.pyramid is not None and self.pyramid.n > 0:
+            self.pyramid.save(f"data/{self.filename[:-4]}.pyr.npz")
+
+    def close(self):
+        """Save the pyramid, close the archive and release the Labjack handle
+
+        """
+        if self.csv_log == True:
+            self.save_pyramid()
+        if self.archive is not None:
+            self.archive.close()
+        ljm.close(self.handle)
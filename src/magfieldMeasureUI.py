@@ -20,11 +20,15 @@ class MainWindow(QMainWindow):
         x (QLabel): B_x readout
         y (QLabel): B_y readout
         z (QLabel): B_z readout
+        status (QLabel): reference reading status; None without drift correction
         fg (fluxgateLJ): fluxgate being read
     """
-    def __init__(self):
+    def __init__(self, drift=None, reference_every=10):
         """Initialize window
 
+        Args:
+            drift (str): drift correction mode passed to fluxgateLJ; None to scan without references
+            reference_every (int): readings between requested references
         """
         super().__init__()
 
@@ -34,6 +38,16 @@ class MainWindow(QMainWindow):
         button = QPushButton("Measure")
         button.clicked.connect(self.measure)
 
+        # button to take a drift reference with the probe at the reference point
+        self.status = None
+        if drift is not None:
+            refButton = QPushButton("Reference")
+            refButton.clicked.connect(self.reference)
+
+            self.status = QLabel()
+            self.status.setAlignment(Qt.AlignCenter)
+            self.status.setText("Take a reference before scanning")
+
         self.x = QLabel()
         self.x.setAlignment(Qt.AlignCenter)
         self.x.setFont(QFont("Arial", 18))
@@ -61,6 +75,9 @@ class MainWindow(QMainWindow):
         layout = QVBoxLayout()
         layout.addWidget(display)
         layout.addWidget(button)
+        if drift is not None:
+            layout.addWidget(refButton)
+            layout.addWidget(self.status)
 
         # assign full layout to central widget
         widget = QWidget()
@@ -71,7 +88,7 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(widget)
 
         # initialize fg
-        self.fg = fluxgateLJ(csv_log=True, increment=5)
+        self.fg = fluxgateLJ(csv_log=True, increment=5, drift=drift, reference_every=reference_every)
         self.fg.setup(x=0,y=1,z=2)
 
 
@@ -82,6 +99,13 @@ class MainWindow(QMainWindow):
         if isinstance(event, QKeyEvent):
             self.measure
 
+    def closeEvent(self, event):
+        """Save logged data summaries and release the Labjack on exit
+
+        """
+        self.fg.close()
+        event.accept()
+
     def measure(self):
         """Take measuremetn
 
@@ -92,11 +116,21 @@ class MainWindow(QMainWindow):
         self.y.setText(f"Y: {dat[1]:.2f}")
         self.z.setText(f"Z: {dat[2]:.2f}")
 
+        if self.status is not None and self.fg.reference_due:
+            self.status.setText("Reference due: return probe to reference point")
+
+    def reference(self):
+        """Take drift reference reading
+
+        """
+        dat = self.fg.read_reference()
+        self.status.setText(f"Reference: {dat[0]:.2f}, {dat[1]:.2f}, {dat[2]:.2f}")
+
 
 # start application
 app = QApplication(sys.argv)
 
-# open window
-window = MainWindow()
+# open window, pass --drift to scan with reference readings
+window = MainWindow(drift="reference" if "--drift" in sys.argv else None)
 window.show()
 sys.exit(app.exec_())
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""
+Script to browse a long capture through its decimation pyramid
+Zooming or panning re-fetches only the resolution needed for the visible window
+Rylan Stutters
+Oct 2026
+"""
+
+import numpy as np
+import matplotlib.pyplot as plt
+import pandas as pd
+import os
+import sys
+
+sys.path.append("src")
+from decimationPyramid import fieldPyramid, plot_pyramid
+from sampleArchive import sampleArchive
+
+
+def load_capture(file):
+    # use the pyramid saved during logging if present, otherwise build it from the csv
+    path = os.path.join("data", file[:-4] + ".pyr.npz")
+    if os.path.exists(path):
+        return fieldPyramid.load(path)
+    return fieldPyramid.from_csv(file)
+
+def raw_reader(file, columns):
+    # full resolution windows come from the binary archive if logged, otherwise the csv
+    path = os.path.join("data", file[:-4] + ".fgb")
+    if os.path.exists(path):
+        archive = sampleArchive(path)
+        return lambda i0, i1: np.column_stack([archive.samples(i0, i1)[c] for c in columns])
+
+    path = os.path.join("data", file)
+    csv_columns = list(pd.read_csv(path, header=1, nrows=0).columns)
+    if not all(c in csv_columns for c in columns):
+        return None
+
+    # date line, blank line and column names come before the samples
+    def read(i0, i1):
+        df = pd.read_csv(path, header=None, names=csv_columns, skiprows=3 + i0,
+                         nrows=i1 - i0, skip_blank_lines=False)
+        return df[columns].to_numpy(dtype=float)
+    return read
+
+def browse(pyr, raw=None, field_comp="B_y (uT)", max_points=2000):
+    fig, ax = plt.subplots()
+    busy = [False]
+
+    def redraw(ax):
+        # set_xlim below fires xlim_changed again
+        if busy[0]:
+            return
+        busy[0] = True
+        xmin, xmax = ax.get_xlim()
+        ymin, ymax = ax.get_ylim()
+        # drop previous artists, keep the view limits set by the zoom
+        for artist in list(ax.lines) + list(ax.collections):
+            artist.remove()
+        level = plot_pyramid(ax, pyr, field_comp, xmin, xmax, max_points, raw, color="tab:blue")
+        ax.set_title(f"level {level}: {2**level} samples per point")
+        ax.set_xlim(xmin, xmax)
+        ax.set_ylim(ymin, ymax)
+        ax.figure.canvas.draw_idle()
+        busy[0] = False
+
+    level = plot_pyramid(ax, pyr, field_comp, max_points=max_points, raw=raw, color="tab:blue")
+    ax.set_title(f"level {level}: {2**level} samples per point")
+    ax.set_xlabel(pyr.columns[0], fontsize=18)
+    ax.set_ylabel(field_comp, fontsize=18)
+    ax.callbacks.connect("xlim_changed", redraw)
+
+    plt.grid()
+    plt.show()
+
+
+file = "fluxgate_2025-12-18_13.02.29.csv"
+pyr = load_capture(file)
+browse(pyr, raw_reader(file, pyr.columns))
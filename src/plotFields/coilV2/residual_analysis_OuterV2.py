@@ -12,14 +12,20 @@ import matplotlib.pyplot as plt
 import os
 from io import StringIO
 
-def extract_field(file1, file2):
+def extract_field(file1, file2, corrected=True):
     path1 = os.path.join("data", file1)
     path2 = os.path.join("data", file2)
     df_1 = pd.read_csv(path1, header=1)
     df_2 = pd.read_csv(path2, header=1)
 
-    df = (df_1 - df_2) / 2
-    df["Position (cm)"] = df_1["Position (cm)"]
+    # drift corrected captures log the corrected fields after the raw ones
+    fields = ["B_x (uT)", "B_y (uT)", "B_z (uT)"]
+    corr = ["B_x corr (uT)", "B_y corr (uT)", "B_z corr (uT)"]
+    use = corr if corrected and all(c in df_1 and c in df_2 for c in corr) else fields
+
+    df = pd.DataFrame({"Position (cm)": df_1["Position (cm)"]})
+    for name, col in zip(fields, use):
+        df[name] = (df_1[col] - df_2[col]) / 2
 
     if df.iloc[:, 1:4].mean().mean() < 0:
         df.iloc[:, 1:4] = -df.iloc[:, 1:4]
@@ -0,0 +1,231 @@
+"""
+Script to render the analysis plots for many run pairs to files without opening windows
+Figures are rendered in parallel worker processes and keyed by a hash of their
+inputs, so only new or changed figures are drawn again
+Rylan Stutters
+Oct 2026
+
+Run from the top of the repo:
+    python src/plotFields/renderPlots.py --out plots --format pdf
+"""
+
+import matplotlib
+matplotlib.use("Agg")
+
+import numpy as np
+import matplotlib.pyplot as plt
+import pandas as pd
+import os
+import json
+import hashlib
+import argparse
+from io import StringIO
+from concurrent.futures import ProcessPoolExecutor
+
+
+def extract_field(file1, file2, corrected=True):
+    path1 = os.path.join("data", file1)
+    path2 = os.path.join("data", file2)
+    df_1 = pd.read_csv(path1, header=1)
+    df_2 = pd.read_csv(path2, header=1)
+
+    # drift corrected captures log the corrected fields after the raw ones
+    fields = ["B_x (uT)", "B_y (uT)", "B_z (uT)"]
+    corr = ["B_x corr (uT)", "B_y corr (uT)", "B_z corr (uT)"]
+    use = corr if corrected and all(c in df_1 and c in df_2 for c in corr) else fields
+
+    df = pd.DataFrame({"Position (cm)": df_1["Position (cm)"]})
+    for name, col in zip(fields, use):
+        df[name] = (df_1[col] - df_2[col]) / 2
+
+    if df.iloc[:, 1:4].mean().mean() < 0:
+        df.iloc[:, 1:4] = -df.iloc[:, 1:4]
+
+    return df
+
+def clean_COMSOL_field(input, offset, scale, cutL, cutR):
+    path = os.path.join("src", "residual_analysis", "simFields", input)
+
+    data = []
+    with open(path, "r") as f:
+        for line in f:
+            # Remove whitespace
+            stripped = line.strip()
+            if not stripped:
+                continue
+            if stripped[0] != "%":
+                data.append(stripped)
+
+    data = "\n".join(data)
+    df = pd.read_csv(StringIO(data), sep=r"\s+", header=None)
+    df[0] = df[0] * scale
+    df[0] = df[0] - offset
+    df = df.drop_duplicates(subset=0).sort_values(0)
+
+    df = df[(df[0] >= cutL) & (df[0] <= cutR)]
+
+    return df
+
+def get_dfcol(df, i):
+     return df.iloc[:, int(i)]
+
+def reverse_field(df):
+    for i in np.linspace(1, 3, 3):
+            col = get_dfcol(df, i)
+            df.iloc[:, int(i)] = col[::-1].to_numpy()
+    return df
+
+def measured_residuals(df1, df2):
+    df = df1 - df2
+    df["Position (cm)"] = df1["Position (cm)"]
+    return df
+
+def sim_residuals(field, field_sim, comp=2):
+    # simulated - measured at each measured position, nan outside the simulation
+    sim_at = np.interp(get_dfcol(field, 0), get_dfcol(field_sim, 0), get_dfcol(field_sim, 1),
+                       left=np.nan, right=np.nan)
+    return sim_at - get_dfcol(field, comp)
+
+
+def plot_single(job):
+    field = extract_field(*job["runs"][0])
+    comp = job.get("comp", 2)
+
+    fig, ax = plt.subplots()
+    ax.scatter(get_dfcol(field, 0), get_dfcol(field, comp), label=field.columns[comp], marker='.')
+
+    ax.set_xlabel('Position (cm)', fontsize=18)
+    ax.set_ylabel('B(uT)', fontsize=18)
+    ax.legend(fontsize=15)
+    ax.grid()
+    return fig
+
+def plot_flange(job):
+    # flange run is reversed to line up with the center run, as in plotFields.py
+    field_flg = reverse_field(extract_field(*job["runs"][0]))
+    field_ctr = extract_field(*job["runs"][1])
+    residuals = measured_residuals(field_ctr, field_flg)
+    comp = job.get("comp", 2)
+
+    fig, ax = plt.subplots()
+    ax.scatter(get_dfcol(field_flg, 0), get_dfcol(field_flg, comp), label='At Flange')
+    ax.scatter(get_dfcol(field_ctr, 0), get_dfcol(field_ctr, comp), label='At Center')
+    ax.scatter(get_dfcol(residuals, 0), get_dfcol(residuals, comp)*10, label='Residuals * 10')
+
+    ax.set_xlabel('Position (cm)', fontsize=18)
+    ax.set_ylabel(field_ctr.columns[comp], fontsize=18)
+    ax.legend(fontsize=15)
+    ax.grid()
+    return fig
+
+def plot_compare(job):
+    field = extract_field(*job["runs"][0])
+    field_sim = clean_COMSOL_field(*job["sim"])
+    comp = job.get("comp", 2)
+    yerr = job.get("yerr", 0.3)
+
+    fig, ax = plt.subplots(figsize=(10,10))
+    ax.errorbar(get_dfcol(field, 0), get_dfcol(field, comp), xerr=0.5, yerr=yerr, label='Measured', fmt='o', color="orange")
+    ax.scatter(get_dfcol(field_sim, 0), get_dfcol(field_sim, 1), label='Simulated', s=2)
+    if job.get("residuals", True):
+        ax.errorbar(get_dfcol(field, 0), sim_residuals(field, field_sim, comp), yerr=job.get("res_err", yerr),
+                    label='Residuals', fmt='o', color="purple")
+
+    ax.set_xlabel('Axial Position (cm)', fontsize=24)
+    ax.set_ylabel('Vertical Magnetic Field (uT)', fontsize=24)
+    ax.legend(fontsize=20)
+    ax.grid()
+    return fig
+
+plotters = {"single": plot_single, "flange": plot_flange, "compare": plot_compare}
+
+
+def job_hash(job):
+    """Hash of everything a figure depends on: job settings, input file contents and this script
+
+    Args:
+        job (dict): figure description
+
+    Returns:
+        str: hex digest
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps(job, sort_keys=True).encode())
+    paths = [os.path.join("data", f) for run in job["runs"] for f in run]
+    if "sim" in job:
+        paths.append(os.path.join("src", "residual_analysis", "simFields", job["sim"][0]))
+    for path in paths + [os.path.abspath(__file__)]:
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+def render(job, out_dir, fmt):
+    """Render one figure to out_dir unless a file with the same input hash exists
+
+    Args:
+        job (dict): figure description, 'kind' is a key of plotters
+        out_dir (str): output directory
+        fmt (str): file format, eg. png or pdf
+
+    Returns:
+        tuple: (path, True if drawn or False if skipped)
+    """
+    path = os.path.join(out_dir, f"{job['name']}_{job_hash(job)[:12]}.{fmt}")
+    if os.path.exists(path):
+        return path, False
+
+    fig = plotters[job["kind"]](job)
+    fig.savefig(path, bbox_inches="tight")
+    plt.close(fig)
+    return path, True
+
+def render_all(jobs, out_dir="plots", fmt="png", workers=None):
+    """Render every job in parallel, skipping figures whose inputs are unchanged
+
+    Args:
+        jobs (list): figure descriptions
+        out_dir (str): output directory
+        fmt (str): file format
+        workers (int): number of processes; None for one per core
+
+    Returns:
+        list: (path, drawn) per job
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(render, job, out_dir, fmt) for job in jobs]
+        return [f.result() for f in futures]
+
+
+# figures of the existing analysis scripts
+jobs = [
+    {"name": "singleField_2025-12-18", "kind": "single",
+     "runs": [["fluxgate_2025-12-18_13.02.29.csv", "fluxgate_2025-12-18_13.08.52.csv"]]},
+    {"name": "flangeCenter_2025-09-23", "kind": "flange",
+     "runs": [["fluxgate_2025-09-23_14.10.26.csv", "fluxgate_2025-09-23_14.14.21.csv"],
+              ["fluxgate_2025-08-25_12.12.27.csv", "fluxgate_2025-08-25_12.16.05.csv"]]},
+    {"name": "compare_taperV2", "kind": "compare", "residuals": False, "yerr": 0.5,
+     "runs": [["fluxgate_2025-12-18_13.02.29.csv", "fluxgate_2025-12-18_13.08.52.csv"]],
+     "sim": ["taperV2axialField.txt", -15, 100, -20, 100]},
+    {"name": "residuals_taperV2", "kind": "compare", "yerr": 0.3, "res_err": 0.4,
+     "runs": [["fluxgate_2025-12-18_13.02.29.csv", "fluxgate_2025-12-18_13.08.52.csv"]],
+     "sim": ["taperV2axialField.txt", -15, 100, -20, 100]},
+    {"name": "residuals_innerV2", "kind": "compare", "yerr": 0.15,
+     "runs": [["fluxgate_2025-11-28_16.08.07.csv", "fluxgate_2025-11-28_16.12.26.csv"]],
+     "sim": ["innerV2AxialField.txt", -11, 100, -20, 100]},
+    {"name": "residuals_outerV2", "kind": "compare", "yerr": 0.3, "res_err": 0.5,
+     "runs": [["fluxgate_2025-12-18_12.23.28.csv", "fluxgate_2025-12-18_12.27.27.csv"]],
+     "sim": ["taperV2outerField.txt", -15.5, 100, -20, 35]},
+]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render analysis plots to files")
+    parser.add_argument("--out", default="plots", help="output directory")
+    parser.add_argument("--format", default="png", help="png, pdf, svg, ...")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    results = render_all(jobs, args.out, args.format, args.workers)
+    for path, drawn in results:
+        print(f"{'rendered' if drawn else 'unchanged'}: {path}")
@@ -0,0 +1,214 @@
+"""
+Script to score many COMSOL simulated coil variants against measured fields
+Every (run, sim, offset, field scale) combination is scored in a process pool
+and written out as a table ranked by RMS residual
+Rylan Stutters
+Oct 2026
+
+Example, from the top of the repo:
+    python src/residual_analysis/coilSweep.py \
+        --runs fluxgate_2025-12-18_13.02.29.csv,fluxgate_2025-12-18_13.08.52.csv \
+        --offsets -20 0 0.5 --cut -20 100
+"""
+
+import numpy as np
+import pandas as pd
+import os
+import argparse
+from io import StringIO
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+
+# parsed inputs shared with every worker once through the pool initializer
+_runs = {}
+_sims = {}
+
+
+def extract_field(file1, file2, corrected=True):
+    path1 = os.path.join("data", file1)
+    path2 = os.path.join("data", file2)
+    df_1 = pd.read_csv(path1, header=1)
+    df_2 = pd.read_csv(path2, header=1)
+
+    # drift corrected captures log the corrected fields after the raw ones
+    fields = ["B_x (uT)", "B_y (uT)", "B_z (uT)"]
+    corr = ["B_x corr (uT)", "B_y corr (uT)", "B_z corr (uT)"]
+    use = corr if corrected and all(c in df_1 and c in df_2 for c in corr) else fields
+
+    df = pd.DataFrame({"Position (cm)": df_1["Position (cm)"]})
+    for name, col in zip(fields, use):
+        df[name] = (df_1[col] - df_2[col]) / 2
+
+    if df.iloc[:, 1:4].mean().mean() < 0:
+        df.iloc[:, 1:4] = -df.iloc[:, 1:4]
+
+    return df
+
+@lru_cache(maxsize=None)
+def clean_COMSOL_field(input, sim_dir=os.path.join("src", "residual_analysis", "simFields")):
+    """Parse a 1D COMSOL line export into sorted arrays ready for np.interp
+
+    Args:
+        input (str): file name in sim_dir
+        sim_dir (str): directory of COMSOL exports
+
+    Returns:
+        tuple: (position in m, field) arrays, or None if the export is not 1D
+    """
+    path = os.path.join(sim_dir, input)
+
+    data = []
+    with open(path, "r") as f:
+        for line in f:
+            # Remove whitespace
+            stripped = line.strip()
+            if not stripped:
+                continue
+            if stripped.startswith("% Dimension:") and stripped.split()[-1] != "1":
+                return None
+            if stripped[0] != "%":
+                data.append(stripped)
+
+    data = "\n".join(data)
+    df = pd.read_csv(StringIO(data), sep=r"\s+", header=None)
+
+    # np.interp needs increasing, unique positions
+    x, idx = np.unique(df[0].to_numpy(), return_index=True)
+    return x, df[1].to_numpy()[idx]
+
+def _init_worker(runs, sims):
+    _runs.update(runs)
+    _sims.update(sims)
+
+def score_pair(run, sim, offsets, field_scales, scale=100, cutL=-np.inf, cutR=np.inf, field_comp=2,
+               min_coverage=0.9):
+    """Score one measured run against one simulation for every offset and field scale
+
+    Residuals are simulated - measured, as in the residual_analysis scripts.
+
+    Args:
+        run (tuple): (file1, file2) measured forward/reversed current pair
+        sim (str): COMSOL export name
+        offsets (list): sim position offsets to try in cm
+        field_scales (list): factors applied to the sim field, eg. coil current or sign
+        scale (float): sim position unit conversion to cm
+        cutL (float): left cut on sim position in cm
+        cutR (float): right cut on sim position in cm
+        field_comp (int): measured column to compare against, 1-3 for Bx-Bz
+        min_coverage (float): fraction of the measured points inside the cut that the shifted
+            sim must cover; offsets below it are not scored, so small overlaps cannot rank high
+
+    Returns:
+        list: one dict of scores per combination
+    """
+    pos, meas = _runs[run]
+    sim_x, sim_B = _sims[sim]
+    meas = meas[:, field_comp - 1]
+
+    # measured points the sim is expected to cover
+    expected = ((pos >= cutL) & (pos <= cutR)).sum()
+    min_points = max(int(np.ceil(min_coverage * expected)), 2)
+
+    rows = []
+    for offset in offsets:
+        x = sim_x * scale - offset
+        keep = (x >= cutL) & (x <= cutR)
+        x = x[keep]
+
+        # only score measured points covered by the shifted simulation
+        inside = (pos >= x[0]) & (pos <= x[-1]) if len(x) > 1 else np.zeros(len(pos), dtype=bool)
+        if inside.sum() < min_points:
+            continue
+        sim_at = np.interp(pos[inside], x, sim_B[keep])
+
+        for field_scale in field_scales:
+            res = sim_at * field_scale - meas[inside]
+            fit_offset = res.mean()
+            rows.append({"run": f"{run[0]} - {run[1]}",
+                         "sim": sim,
+                         "offset (cm)": offset,
+                         "field scale": field_scale,
+                         "points": int(inside.sum()),
+                         "coverage": inside.sum() / expected,
+                         "rms": np.sqrt(np.mean(res**2)),
+                         "max deviation": np.abs(res).max(),
+                         "fitted offset": fit_offset,
+                         "rms after offset": np.sqrt(np.mean((res - fit_offset)**2))})
+    return rows
+
+def sweep(runs, sim_dir, offsets, field_scales=(1,), scale=100, cutL=-np.inf, cutR=np.inf,
+          field_comp=2, workers=None, min_coverage=0.9):
+    """Score every run against every 1D simulation in sim_dir in parallel
+
+    Files are parsed once here and handed to each worker on start up, so the
+    pool only ships the small task arguments.
+
+    Args:
+        runs (list): (file1, file2) measured run pairs in data/
+        sim_dir (str): directory of COMSOL exports
+        offsets (list): sim position offsets to try in cm
+        field_scales (list): factors applied to the sim field
+        scale (float): sim position unit conversion to cm
+        cutL (float): left cut on sim position in cm
+        cutR (float): right cut on sim position in cm
+        field_comp (int): measured column to compare against, 1-3 for Bx-Bz
+        workers (int): number of processes; None for one per core
+        min_coverage (float): fraction of measured points inside the cut a combination must cover
+
+    Returns:
+        pd.DataFrame: scores ranked by rms
+    """
+    parsed_runs = {}
+    for run in runs:
+        df = extract_field(*run)
+        parsed_runs[tuple(run)] = (df.iloc[:, 0].to_numpy(dtype=float), df.iloc[:, 1:4].to_numpy(dtype=float))
+
+    parsed_sims = {}
+    for sim in sorted(os.listdir(sim_dir)):
+        if sim.endswith(".txt"):
+            field = clean_COMSOL_field(sim, sim_dir)
+            if field is not None:
+                parsed_sims[sim] = field
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(parsed_runs, parsed_sims)) as pool:
+        futures = [pool.submit(score_pair, run, sim, list(offsets), list(field_scales),
+                               scale, cutL, cutR, field_comp, min_coverage)
+                   for run in parsed_runs for sim in parsed_sims]
+        rows = [row for f in futures for row in f.result()]
+
+    columns = ["run", "sim", "offset (cm)", "field scale", "points", "coverage", "rms",
+               "max deviation", "fitted offset", "rms after offset"]
+    table = pd.DataFrame(rows, columns=columns)
+    return table.sort_values("rms", ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank COMSOL coil variants against measured fields")
+    parser.add_argument("--runs", nargs="+", required=True,
+                        help="measured pairs as file1,file2 in data/")
+    parser.add_argument("--sims", default=os.path.join("src", "residual_analysis", "simFields"),
+                        help="directory of COMSOL exports")
+    parser.add_argument("--offsets", nargs=3, type=float, default=[-20, 0, 0.5],
+                        metavar=("START", "STOP", "STEP"), help="sim position offsets in cm")
+    parser.add_argument("--field-scales", nargs="+", type=float, default=[1],
+                        help="factors applied to the sim field")
+    parser.add_argument("--scale", type=float, default=100, help="sim position to cm conversion")
+    parser.add_argument("--cut", nargs=2, type=float, default=[-np.inf, np.inf],
+                        metavar=("LEFT", "RIGHT"), help="cut on sim position in cm")
+    parser.add_argument("--component", type=int, default=2, help="measured column, 1-3 for Bx-Bz")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--min-coverage", type=float, default=0.9,
+                        help="fraction of measured points inside the cut the sim must cover")
+    parser.add_argument("--top", type=int, default=20, help="rows to print")
+    parser.add_argument("--out", default=None, help="csv file for the full ranked table")
+    args = parser.parse_args()
+
+    start, stop, step = args.offsets
+    table = sweep([tuple(r.split(",")) for r in args.runs], args.sims,
+                  np.arange(start, stop + step / 2, step), args.field_scales, args.scale,
+                  args.cut[0], args.cut[1], args.component, args.workers, args.min_coverage)
+
+    print(table.head(args.top).to_string())
+    if args.out is not None:
+        table.to_csv(args.out, index=False)
@@ -0,0 +1,297 @@
+"""
+Reconstruct a gridded field map from scattered (x, y, z, Bx, By, Bz) measurements
+and compare it against 3D COMSOL exports
+Rylan Stutters
+Oct 2026
+
+Two reconstructions are available:
+    idw_map: inverse distance weighting over the nearest measured points, works for 2D or 3D grids
+    potential_map: least squares fit of a scalar potential on the grid, B = grad(phi), with a
+        Laplacian penalty so the map is curl free and close to divergence free
+
+Positions are in cm and fields in uT, as logged by fluxgateLJ.
+"""
+
+import numpy as np
+import pandas as pd
+import os
+from io import StringIO
+from scipy.spatial import cKDTree
+from scipy.interpolate import RegularGridInterpolator
+from scipy import sparse
+from scipy.sparse.linalg import lsqr
+
+
+class fieldMap:
+    """Field sampled on a regular grid
+
+    Attributes:
+        axes (tuple): x, y, z grid coordinates in cm
+        B (np.ndarray): field in uT, shape (nx, ny, nz, 3)
+    """
+
+    def __init__(self, axes, B):
+        """Initialize map
+
+        Args:
+            axes (tuple): x, y, z grid coordinates in cm, increasing
+            B (np.ndarray): field in uT, shape (nx, ny, nz, 3)
+        """
+        self.axes = tuple(np.asarray(a, dtype=float) for a in axes)
+        self.B = np.asarray(B, dtype=float)
+
+    def at(self, points):
+        """Interpolate the map at arbitrary points inside the grid
+
+        Args:
+            points (np.ndarray): positions in cm, shape (n, 3)
+
+        Returns:
+            np.ndarray: field in uT, shape (n, 3); nan outside the grid
+        """
+        points = np.asarray(points, dtype=float)
+
+        # flat axes of a 2D map are dropped, points must lie on them
+        keep = [i for i, a in enumerate(self.axes) if len(a) > 1]
+        on_plane = np.ones(len(points), dtype=bool)
+        for i, a in enumerate(self.axes):
+            if len(a) == 1:
+                on_plane &= np.isclose(points[:, i], a[0])
+
+        B = self.B.reshape([len(self.axes[i]) for i in keep] + [3])
+        interp = RegularGridInterpolator([self.axes[i] for i in keep], B,
+                                         bounds_error=False, fill_value=np.nan)
+        out = interp(points[:, keep])
+        out[~on_plane] = np.nan
+        return out
+
+    def to_COMSOL(self, path):
+        """Write map in the COMSOL spreadsheet layout, in m and T like the 3D exports
+
+        Args:
+            path (str): output file
+        """
+        X, Y, Z = np.meshgrid(*self.axes, indexing="ij")
+        data = np.column_stack([X.ravel() / 100, Y.ravel() / 100, Z.ravel() / 100,
+                                self.B.reshape(-1, 3) * 1e-6])
+        with open(path, "w") as f:
+            f.write("% Dimension:          3\n")
+            f.write(f"% Nodes:              {len(data)}\n")
+            f.write("% Description:        Reconstructed fluxgate field map\n")
+            f.write("% Length unit:        m\n")
+            f.write("% x y z mf.Bx (T) mf.By (T) mf.Bz (T)\n")
+            np.savetxt(f, data)
+
+
+def load_survey(file):
+    """Read a scattered survey from data/, columns x, y, z (cm), Bx, By, Bz (uT)
+
+    Args:
+        file (str): csv file in data/ with the fluxgateLJ date header
+
+    Returns:
+        tuple: points shape (n, 3), field shape (n, 3)
+    """
+    df = pd.read_csv(os.path.join("data", file), header=1)
+    return df.iloc[:, 0:3].to_numpy(dtype=float), df.iloc[:, 3:6].to_numpy(dtype=float)
+
+def make_axes(points, spacing, pad=0):
+    """Build grid axes covering the survey
+
+    Args:
+        points (np.ndarray): positions in cm, shape (n, 3)
+        spacing (float or tuple): grid spacing in cm per axis
+        pad (float): extra margin around the survey in cm
+
+    Returns:
+        tuple: x, y, z grid coordinates; an axis the survey does not span has one node
+    """
+    spacing = np.broadcast_to(np.asarray(spacing, dtype=float), (3,))
+    lo = points.min(axis=0) - pad
+    hi = points.max(axis=0) + pad
+
+    axes = []
+    for i in range(3):
+        n = int(np.ceil((hi[i] - lo[i]) / spacing[i])) + 1
+        axes.append(lo[i] + spacing[i] * np.arange(n) if hi[i] > lo[i] else np.array([lo[i]]))
+    return tuple(axes)
+
+def idw_map(points, B, axes, k=8, power=2, block=65536):
+    """Inverse distance weighted map from the k nearest measurements of each node
+
+    Args:
+        points (np.ndarray): positions in cm, shape (n, 3)
+        B (np.ndarray): field in uT, shape (n, 3)
+        axes (tuple): x, y, z grid coordinates
+        k (int): number of neighbours per node
+        power (float): distance weighting exponent
+        block (int): nodes queried at once, bounds memory on large grids
+
+    Returns:
+        fieldMap: reconstructed map
+    """
+    points = np.asarray(points, dtype=float)
+    B = np.asarray(B, dtype=float)
+    k = min(k, len(points))
+
+    tree = cKDTree(points)
+    nodes = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, 3)
+    out = np.empty((len(nodes), 3))
+
+    for start in range(0, len(nodes), block):
+        d, idx = tree.query(nodes[start:start + block], k=k, workers=-1)
+        d = d.reshape(len(d), -1)
+        idx = idx.reshape(len(idx), -1)
+
+        # a node sitting on a measurement takes its value
+        w = 1 / np.maximum(d, 1e-12)**power
+        exact = d[:, 0] < 1e-12
+        w[exact] = 0
+        w[exact, 0] = 1
+
+        out[start:start + block] = np.einsum("nk,nkc->nc", w, B[idx]) / w.sum(axis=1)[:, None]
+
+    return fieldMap(axes, out.reshape([len(a) for a in axes] + [3]))
+
+def _gradient_matrix(points, axes):
+    # sparse operator from node potentials to the gradient of their trilinear interpolant
+    shape = [len(a) for a in axes]
+    n = len(points)
+
+    cell = []
+    frac = []
+    h = []
+    for i, a in enumerate(axes):
+        j = np.clip(np.searchsorted(a, points[:, i], side="right") - 1, 0, len(a) - 2)
+        cell.append(j)
+        h.append(a[j + 1] - a[j])
+        frac.append((points[:, i] - a[j]) / h[-1])
+
+    rows, cols, vals = [], [], []
+    for corner in np.ndindex(2, 2, 2):
+        idx = np.ravel_multi_index([cell[i] + corner[i] for i in range(3)], shape)
+        w = [frac[i] if corner[i] else 1 - frac[i] for i in range(3)]
+        dw = [(1 if corner[i] else -1) / h[i] for i in range(3)]
+        for comp in range(3):
+            f = [dw[i] if i == comp else w[i] for i in range(3)]
+            rows.append(comp * n + np.arange(n))
+            cols.append(idx)
+            vals.append(f[0] * f[1] * f[2])
+
+    return sparse.csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+                             shape=(3 * n, int(np.prod(shape))))
+
+def _laplacian(axes):
+    # 3D Laplacian on the grid from second differences along each axis
+    ops = []
+    for a in axes:
+        h = np.diff(a).mean()
+        d = sparse.diags([1, -2, 1], [-1, 0, 1], shape=(len(a), len(a)), dtype=float).tolil()
+        # no central difference at the ends, leave the boundary nodes unpenalized
+        d[0, :] = 0
+        d[-1, :] = 0
+        ops.append(d.tocsr() / h**2)
+
+    eye = [sparse.identity(len(a), format="csr") for a in axes]
+    return (sparse.kron(sparse.kron(ops[0], eye[1]), eye[2])
+            + sparse.kron(sparse.kron(eye[0], ops[1]), eye[2])
+            + sparse.kron(sparse.kron(eye[0], eye[1]), ops[2])).tocsr()
+
+def potential_map(points, B, axes, smoothing=0.1, iter_lim=2000):
+    """Fit B = grad(phi) with phi on the grid, penalizing div(B) = laplacian(phi)
+
+    The system is sparse, 8 nonzeros per measured component plus a 7 point
+    stencil per node, and is solved iteratively with lsqr.
+
+    Args:
+        points (np.ndarray): positions in cm, shape (n, 3); must lie inside the grid
+        B (np.ndarray): field in uT, shape (n, 3)
+        axes (tuple): x, y, z grid coordinates, at least two nodes each
+        smoothing (float): weight of the divergence penalty relative to the data
+        iter_lim (int): maximum lsqr iterations
+
+    Returns:
+        fieldMap: reconstructed map
+    """
+    points = np.asarray(points, dtype=float)
+    B = np.asarray(B, dtype=float)
+
+    if any(len(a) < 2 for a in axes):
+        raise RuntimeError('potential_map requires a 3D grid, use idw_map for planar surveys')
+    lo = np.array([a[0] for a in axes])
+    hi = np.array([a[-1] for a in axes])
+    if np.any(points < lo) or np.any(points > hi):
+        raise RuntimeError('All measured points must lie inside the grid')
+
+    G = _gradient_matrix(points, axes)
+    h = np.mean([np.diff(a).mean() for a in axes])
+    L = _laplacian(axes) * (smoothing * h * np.sqrt(len(points) / G.shape[1]))
+
+    A = sparse.vstack([G, L]).tocsr()
+    b = np.concatenate([B[:, 0], B[:, 1], B[:, 2], np.zeros(L.shape[0])])
+    phi = lsqr(A, b, atol=1e-8, btol=1e-8, iter_lim=iter_lim)[0]
+
+    phi = phi.reshape([len(a) for a in axes])
+    grad = np.gradient(phi, *axes, edge_order=2)
+    return fieldMap(axes, np.stack(grad, axis=-1))
+
+def load_COMSOL_grid(input, sim_dir=os.path.join("src", "residual_analysis", "simFields")):
+    """Read a 3D COMSOL export of x y z Bx By Bz, converted to cm and uT
+
+    Args:
+        input (str): file name in sim_dir
+        sim_dir (str): directory of the COMSOL export
+
+    Returns:
+        tuple: points shape (n, 3), field shape (n, 3)
+    """
+    path = os.path.join(sim_dir, input)
+
+    data = []
+    length_scale = 1
+    field_scale = 1
+    with open(path, "r") as f:
+        for line in f:
+            # Remove whitespace
+            stripped = line.strip()
+            if not stripped:
+                continue
+            if stripped[0] == "%":
+                if stripped.startswith("% Length unit:") and stripped.split()[-1] == "m":
+                    length_scale = 100
+                if "(T)" in stripped:
+                    field_scale = 1e6
+            else:
+                data.append(stripped)
+
+    df = pd.read_csv(StringIO("\n".join(data)), sep=r"\s+", header=None)
+    if df.shape[1] < 6:
+        raise RuntimeError(f'{input} is not a 3D export of x y z Bx By Bz')
+
+    return df.iloc[:, 0:3].to_numpy() * length_scale, df.iloc[:, 3:6].to_numpy() * field_scale
+
+def compare_COMSOL(fmap, input, offset=(0, 0, 0), sim_dir=os.path.join("src", "residual_analysis", "simFields")):
+    """Residuals of a 3D COMSOL export against a reconstructed map, simulated - measured
+
+    Args:
+        fmap (fieldMap): reconstructed map
+        input (str): 3D export in sim_dir
+        offset (tuple): shift of the sim coordinates into survey coordinates in cm
+        sim_dir (str): directory of the COMSOL export
+
+    Returns:
+        pd.DataFrame: position, simulated, mapped and residual field at every sim node inside the map
+    """
+    points, B_sim = load_COMSOL_grid(input, sim_dir)
+    points = points - np.asarray(offset)
+    B_map = fmap.at(points)
+
+    inside = ~np.isnan(B_map).any(axis=1)
+    res = B_sim[inside] - B_map[inside]
+
+    df = pd.DataFrame(points[inside], columns=["x (cm)", "y (cm)", "z (cm)"])
+    for i, c in enumerate("xyz"):
+        df[f"B_{c} sim (uT)"] = B_sim[inside, i]
+        df[f"B_{c} map (uT)"] = B_map[inside, i]
+        df[f"B_{c} residual (uT)"] = res[:, i]
+    return df
@@ -0,0 +1,273 @@
+"""
+Fixed record binary archive of raw fluxgate samples, read back by memory mapping
+Rylan Stutters
+Oct 2026
+
+Layout:
+    8 bytes     magic b"FGDAQBIN"
+    4 bytes     little endian uint32, total header length in bytes
+    JSON        version, column names, time column and start time, padded with spaces
+                so the records start on a 64 byte boundary
+    records     one little endian float64 per column, back to back
+
+Reading maps the records as a structured array, so each column is a strided
+view into the file and slicing by sample range or time never copies.
+"""
+
+import numpy as np
+import pandas as pd
+import json
+import os
+import struct
+from datetime import datetime
+
+MAGIC = b"FGDAQBIN"
+VERSION = 1
+
+
+class archiveWriter:
+    """Append samples to a binary archive
+
+    Attributes:
+        path (str): archive file
+        columns (list): column names
+        n (int): number of records written
+    """
+
+    def __init__(self, path, columns, time_column="Time (s)", start=None):
+        """Create archive and write its header
+
+        Args:
+            path (str): archive file, overwritten if it exists
+            columns (list): column names, one float64 per column per record
+            time_column (str): column holding seconds since start; None if there is none
+            start (datetime): time of the first sample; defaults to now
+        """
+        if time_column is not None and time_column not in columns:
+            raise RuntimeError(f'time_column {time_column} is not one of the columns')
+
+        self.path = path
+        self.columns = list(columns)
+        self.n = 0
+
+        start = datetime.now() if start is None else start
+        header = json.dumps({"version": VERSION,
+                             "columns": self.columns,
+                             "time_column": time_column,
+                             "start": start.isoformat()}).encode()
+
+        # pad so records are aligned
+        length = len(MAGIC) + 4 + len(header)
+        length += -length % 64
+        header = header.ljust(length - len(MAGIC) - 4, b" ")
+
+        self.file = open(path, "wb")
+        self.file.write(MAGIC + struct.pack("<I", length) + header)
+        self.file.flush()
+
+    def append(self, rows):
+        """Write one record or a block of records
+
+        Args:
+            rows (np array): shape (len(columns),) or (n, len(columns))
+        """
+        rows = np.atleast_2d(np.asarray(rows, dtype="<f8"))
+        if rows.shape[1] != len(self.columns):
+            raise RuntimeError(f'Expected {len(self.columns)} values per record, got {rows.shape[1]}')
+
+        self.file.write(rows.tobytes())
+        self.file.flush()
+        self.n += len(rows)
+
+    def close(self):
+        """Close archive file
+
+        """
+        self.file.close()
+
+
+class sampleArchive:
+    """Memory mapped, read only view of a binary archive
+
+    Attributes:
+        path (str): archive file
+        columns (list): column names
+        time_column (str): column holding seconds since start; None if there is none
+        start (datetime): time of the first sample
+        records (np.memmap): structured array of every complete record
+    """
+
+    def __init__(self, path):
+        """Open archive, no sample data is read until accessed
+
+        Args:
+            path (str): archive file
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise RuntimeError(f'{path} is not a fluxgate sample archive')
+            length = struct.unpack("<I", f.read(4))[0]
+            header = json.loads(f.read(length - len(MAGIC) - 4))
+
+        if header["version"] != VERSION:
+            raise RuntimeError(f'Unsupported archive version {header["version"]}')
+
+        self.columns = header["columns"]
+        self.time_column = header["time_column"]
+        self.start = datetime.fromisoformat(header["start"])
+
+        # a record still being written by a live capture is left out
+        dtype = np.dtype([(c, "<f8") for c in self.columns])
+        n = (os.path.getsize(path) - length) // dtype.itemsize
+        if n > 0:
+            self.records = np.memmap(path, dtype=dtype, mode="r", offset=length, shape=(n,))
+        else:
+            self.records = np.empty(0, dtype=dtype)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, key):
+        """Column name for a strided view of one axis, or index/slice for records
+
+        """
+        return self.records[key]
+
+    def samples(self, start=None, stop=None):
+        """Records in a sample range, as a view
+
+        Args:
+            start (int): first sample
+            stop (int): one past the last sample
+
+        Returns:
+            np.ndarray: structured view of the records
+        """
+        return self.records[start:stop]
+
+    def between(self, lo=None, hi=None, column=None):
+        """Records with lo <= column <= hi, as a view
+
+        The column must increase monotonically, found by binary search so only
+        a few pages of the file are touched. On the time column the bounds can
+        also be wall clock timestamps.
+
+        Args:
+            lo (float or datetime): lower bound; None for the start of the archive
+            hi (float or datetime): upper bound; None for the end of the archive
+            column (str): column to search, defaults to the time column
+
+        Returns:
+            np.ndarray: structured view of the records
+        """
+        column = self.time_column if column is None else column
+        if column is None:
+            raise RuntimeError('Archive has no time column, pass column')
+
+        # timestamps to seconds since the start in the header
+        if isinstance(lo, datetime) or isinstance(hi, datetime):
+            if column != self.time_column:
+                raise RuntimeError('Timestamp bounds need the time column')
+            lo = (lo - self.start).total_seconds() if isinstance(lo, datetime) else lo
+            hi = (hi - self.start).total_seconds() if isinstance(hi, datetime) else hi
+
+        x = self.records[column]
+        i0 = 0 if lo is None else int(np.searchsorted(x, lo, side="left"))
+        i1 = len(x) if hi is None else int(np.searchsorted(x, hi, side="right"))
+        return self.records[i0:i1]
+
+    def to_frame(self, records=None):
+        """Copy records into a DataFrame, for handing small slices to the pandas scripts
+
+        Args:
+            records (np.ndarray): records from samples or between; defaults to all
+
+        Returns:
+            pd.DataFrame: copy of the records
+        """
+        records = self.records if records is None else records
+        return pd.DataFrame({c: np.asarray(records[c]) for c in self.columns})
+
+
+def archive_field(archive1, archive2, start=None, stop=None, out=None, corrected=True, chunk=1 << 20):
+    """Background subtract a forward/reversed current pair like extract_field, (a1 - a2) / 2
+
+    Works through the column views chunk by chunk, so memory use is bounded by
+    chunk whatever the capture size. The sign is flipped if the mean field is
+    negative, as in extract_field.
+
+    Args:
+        archive1 (sampleArchive): forward current capture
+        archive2 (sampleArchive): reversed current capture
+        start (int): first sample
+        stop (int): one past the last sample; defaults to the end of the shorter capture
+        out (str): archive file to write the result to, for results larger than RAM;
+            None to return it in memory
+        corrected (bool): use the drift corrected fields when both captures have them
+        chunk (int): samples processed at once
+
+    Returns:
+        sampleArchive or np.ndarray: result with position/time from archive1 and B_x, B_y, B_z (uT)
+    """
+    fields = ["B_x (uT)", "B_y (uT)", "B_z (uT)"]
+    corr = ["B_x corr (uT)", "B_y corr (uT)", "B_z corr (uT)"]
+    both = [c for c in archive1.columns if c in archive2.columns]
+    use = corr if corrected and all(c in both for c in corr) else fields
+
+    keep = [c for c in ("Position (cm)", "Time (s)") if c in archive1.columns]
+    r1 = archive1.records[start:stop]
+    r2 = archive2.records[start:stop]
+    n = min(len(r1), len(r2))
+
+    # first pass for the sign of the mean field
+    total = 0
+    for i in range(0, n, chunk):
+        j = min(i + chunk, n)
+        total += sum((r1[c][i:j] - r2[c][i:j]).sum() for c in use)
+    sign = -1 if total < 0 else 1
+
+    columns = keep + fields
+    if out is not None:
+        writer = archiveWriter(out, columns, "Time (s)" if "Time (s)" in keep else None, archive1.start)
+    else:
+        result = np.empty(n, dtype=np.dtype([(c, "<f8") for c in columns]))
+
+    for i in range(0, n, chunk):
+        j = min(i + chunk, n)
+        block = [r1[c][i:j] for c in keep]
+        block += [sign * (r1[c][i:j] - r2[c][i:j]) / 2 for c in use]
+        if out is not None:
+            writer.append(np.column_stack(block))
+        else:
+            for c, col in zip(columns, block):
+                result[c][i:j] = col
+
+    if out is not None:
+        writer.close()
+        return sampleArchive(out)
+    return result
+
+def csv_to_archive(file, chunksize=65536):
+    """Convert a capture in data/ to an archive next to it, data/<name>.fgb
+    The csv is read in chunks, so captures larger than RAM can be converted
+
+    Args:
+        file (str): csv file in data/ with the fluxgateLJ date header
+        chunksize (int): rows read at once
+
+    Returns:
+        str: path of the archive
+    """
+    path = os.path.join("data", file)
+    with open(path, "r") as f:
+        start = datetime.strptime(f.readline().strip(), "%Y-%m-%d, %H:%M:%S")
+    columns = pd.read_csv(path, header=1, nrows=0).columns
+
+    out = os.path.join("data", file[:-4] + ".fgb")
+    time_column = "Time (s)" if "Time (s)" in columns else None
+    writer = archiveWriter(out, columns, time_column, start)
+    for chunk in pd.read_csv(path, header=1, chunksize=chunksize):
+        writer.append(chunk.to_numpy(dtype=float))
+    writer.close()
+    return out